@@ -0,0 +1,200 @@
+"""Read-only JSON API over precomputed aggregates (/api/v1).
+
+Every list endpoint is cursor paginated (?limit=&cursor=) and answers with
+an ETag, so clients can revalidate with If-None-Match; responses are gzip
+compressed when the client accepts it.
+"""
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import math
+from functools import lru_cache
+from typing import Any
+
+import pandas as pd
+from flask import Blueprint, Response, jsonify, request
+
+from files.data import dataset_version, df, species_list
+from files.figures import time_series_arrays
+from files.sites import site_index
+from files.timerange import day_numbers, participant_ranges
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEARBY_MAX_K = 50
+# Kleine Antworten lohnen die Kompression nicht
+GZIP_MIN_BYTES = 500
+
+
+def get_collections() -> dict[str, dict[Any, list[Any]]]:
+    """All API collections keyed by endpoint and path parameter, from the
+    same aggregates the dashboard uses"""
+    participant_totals = participant_ranges.totals().rename_axis(
+        'participant')
+    participant_totals['total_flies'] = participant_totals.sum(axis=1)
+    participant_totals['samples'] = df.groupby('participants')[
+        'sampleId'].nunique()
+
+    # Proben ohne Datum als null statt 0 ausliefern
+    samples = df.assign(
+        collectionEnd=df['collectionEnd'].where(day_numbers > 0)).groupby(
+        ['participants', 'sampleId']).agg(
+        collectionEnd=('collectionEnd', 'first'),
+        **{species: (species, 'sum') for species in species_list})
+    samples['collectionEnd'] = samples['collectionEnd'].astype(object).where(
+        samples['collectionEnd'].notna(), None)
+    samples['total_flies'] = samples[species_list].sum(axis=1)
+    samples = samples.reset_index()
+
+    sites = site_index.sites
+    time_series = {}
+    site_lists = {}
+    for species in species_list:
+        # Zeitreihe des Dashboards, ohne Proben ohne Datum
+        days, dates, counts = time_series_arrays[species]
+        dated = days > 0
+        by_date = pd.Series(counts[dated]).groupby(dates[dated]).sum()
+        time_series[species] = [
+            {'date': str(date), 'count': int(count)}
+            for date, count in by_date.items()]
+        site_lists[species] = sites.loc[
+            sites[species] > 0,
+            ['participants', 'latitude', 'longitude', species]].rename(
+            columns={'participants': 'participant', species: 'count'}
+        ).to_dict('records')
+
+    return {
+        'participants': {
+            None: participant_totals.reset_index().to_dict('records')},
+        # Pfadparameter sind immer Strings, auch bei numerischen
+        # Sammlernummern
+        'samples': {
+            str(participant):
+                rows.drop(columns='participants').to_dict('records')
+            for participant, rows in samples.groupby('participants')},
+        'time_series': time_series,
+        'sites': site_lists}
+
+
+collections = get_collections()
+
+
+def encode_cursor(version: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(
+        f"{version}:{offset}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    version, offset = base64.urlsafe_b64decode(padded).decode().split(':')
+    return version, int(offset)
+
+
+@lru_cache(maxsize=1024)
+def get_page(collection: str, key: Any, offset: int,
+             limit: int) -> tuple[bytes, bytes, str]:
+    """Encoded page, its gzip variant and ETag"""
+    items = collections[collection][key]
+    end = offset + limit
+    body = json.dumps({
+        'version': dataset_version,
+        'total': len(items),
+        'data': items[offset:end],
+        'next_cursor': encode_cursor(dataset_version, end)
+        if end < len(items) else None}, separators=(',', ':')).encode()
+    etag = hashlib.sha1(body).hexdigest()
+    return body, gzip.compress(body), etag
+
+
+def error(message: str, status: int) -> tuple[Response, int]:
+    return jsonify(error=message), status
+
+
+def paginated_response(collection: str, key: Any = None) \
+        -> Response | tuple[Response, int]:
+    if key not in collections[collection]:
+        return error(f"Not found: {key}", 404)
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+        offset = 0
+        if request.args.get('cursor'):
+            version, offset = decode_cursor(request.args['cursor'])
+            if version != dataset_version:
+                return error("Dataset changed, restart without cursor", 410)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return error("Invalid limit or cursor", 400)
+    if not 1 <= limit <= MAX_LIMIT or offset < 0:
+        return error(f"limit must be between 1 and {MAX_LIMIT}", 400)
+
+    body, compressed, etag = get_page(collection, key, offset, limit)
+    use_gzip = len(body) >= GZIP_MIN_BYTES \
+        and 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = Response(
+        compressed if use_gzip else body, mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Jede Kodierung braucht ihren eigenen ETag
+    response.set_etag(f"{etag}-gzip" if use_gzip else etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True  # Immer per ETag revalidieren
+    return response.make_conditional(request)
+
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+@api.route('/participants')
+def list_participants() -> Response | tuple[Response, int]:
+    """Participants with species totals, total flies and sample count"""
+    return paginated_response('participants')
+
+
+@api.route('/participants/<participant>/samples')
+def list_samples(participant: str) -> Response | tuple[Response, int]:
+    """Samples of a participant with collection date and species counts"""
+    return paginated_response('samples', participant)
+
+
+@api.route('/species/<species>/time-series')
+def get_time_series(species: str) -> Response | tuple[Response, int]:
+    """Collected flies of a species per collection date"""
+    return paginated_response('time_series', species)
+
+
+@api.route('/species/<species>/sites')
+def list_sites(species: str) -> Response | tuple[Response, int]:
+    """Trap sites where a species was found, with counts"""
+    return paginated_response('sites', species)
+
+
+@api.route('/nearby')
+def nearby_sites() -> Response | tuple[Response, int]:
+    """k-nearest (k) or within-radius (radius_km) sites as JSON,
+    optionally only sites where the given species was found"""
+    species = request.args.get('species') or None
+    if species is not None and species not in species_list:
+        return error(f"Unknown species: {species}", 400)
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        k = min(int(request.args.get('k', 5)), NEARBY_MAX_K)
+        radius_km = float(request.args['radius_km']) \
+            if 'radius_km' in request.args else None
+    except (KeyError, ValueError):
+        return error("lat and lon are required, lat, lon, k and radius_km "
+                     "must be numbers", 400)
+    if not (math.isfinite(lat) and math.isfinite(lon)
+            and -90 <= lat <= 90 and -180 <= lon <= 180):
+        return error("lat and lon must be valid coordinates", 400)
+    if radius_km is not None:
+        if not (math.isfinite(radius_km) and radius_km > 0):
+            return error("radius_km must be a positive number", 400)
+        sites = site_index.within_radius(lat, lon, radius_km, species)
+    else:
+        if k < 1:
+            return error("k must be at least 1", 400)
+        sites = site_index.nearest(lat, lon, k, species)
+    return jsonify(species=species, sites=sites)
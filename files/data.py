@@ -1,11 +1,23 @@
 # Load CSV
+import hashlib
+
 import pandas as pd
 
-df = pd.read_csv("flies.csv").fillna(0)
+DATA_FILE = "flies.csv"
+
+# Version des Datenstands, damit Caches bei neuen Daten verworfen werden
+with open(DATA_FILE, 'rb') as data_file:
+    dataset_version = hashlib.sha1(data_file.read()).hexdigest()[:12]
+
+df = pd.read_csv(DATA_FILE).fillna(0)
 
 # Ensure total_flies column is numeric
 df["total_flies"] = pd.to_numeric(df["total_flies"], errors="coerce").fillna(0)
 
+# Koordinaten einmalig beim Laden numerisch machen
+df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce").fillna(0)
+df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce").fillna(0)
+
 # Get min and max for normalization
 min_flies = df["total_flies"].min()
 max_flies = df["total_flies"].max()
@@ -0,0 +1,126 @@
+from functools import lru_cache
+from typing import Any, Callable
+
+import numpy as np
+import plotly.io as pio
+
+from files.data import df, species_list
+from files.timerange import (
+    FULL_SEASON, participant_ranges, row_order, sample_ranges, season_ranges,
+    sorted_days)
+from files.util import get_species_color
+
+# Standard-Template einmalig auflösen, so wie go.Figure() es einbettet
+TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+
+def get_time_series_arrays(species: str) -> tuple[np.ndarray, ...]:
+    """Day numbers, dates and counts of all rows with the species, sorted
+    by date so a time window is a slice"""
+    by_date = df.iloc[row_order]
+    found = by_date[species].to_numpy() > 0
+    return (
+        sorted_days[found],
+        by_date['collectionEnd'].to_numpy(dtype=object)[found],
+        by_date[species].to_numpy()[found])
+
+
+# Vorberechnete Arrays, aus denen die Zeitreihen gebaut werden
+time_series_arrays = {
+    species: get_time_series_arrays(species) for species in species_list}
+
+
+def empty_figure(layout: dict[str, Any] | None = None) -> dict[str, Any]:
+    return {'data': [], 'layout': {**(layout or {}), 'template': TEMPLATE}}
+
+
+def species_pie(counts: np.ndarray, title: str) -> dict[str, Any]:
+    """Pie chart of all species with a count greater than 0"""
+    present = counts > 0
+    labels = [s for s, found in zip(species_list, present) if found]
+    return {
+        'data': [{
+            'labels': labels,
+            'marker': {'colors': [get_species_color(s) for s in labels]},
+            'showlegend': False,
+            'values': counts[present].tolist(),
+            'type': 'pie'}],
+        'layout': {'template': TEMPLATE, 'title': {'text': title}}}
+
+
+def build_participant_pie(
+        participant: str, window: tuple[int, int]) -> dict[str, Any]:
+    return species_pie(
+        participant_ranges.group_totals(participant, window),
+        f"Artenverteilung Teilnehmer {participant}")
+
+
+def build_sample_pie(sample: str, window: tuple[int, int]) -> dict[str, Any]:
+    return species_pie(
+        sample_ranges.group_totals(sample, window),
+        f"Artenverteilung Falle {sample}")
+
+
+def build_time_series(species: str, window: tuple[int, int]) \
+        -> dict[str, Any]:
+    days, x, y = time_series_arrays[species]
+    start = np.searchsorted(days, window[0], side='left')
+    end = np.searchsorted(days, window[1], side='right')
+    if start >= end:
+        return {
+            'data': [{'x': [], 'y': [], 'type': 'bar'}],
+            'layout': {
+                'template': TEMPLATE,
+                'title': {'text': f"No data found for {species}"}}}
+    return {
+        'data': [{
+            'marker': {'color': get_species_color(species)},
+            'x': x[start:end].tolist(),
+            'y': y[start:end].tolist(),
+            'type': 'bar'}],
+        'layout': {
+            'template': TEMPLATE,
+            'xaxis': {'title': {'text': 'Time'}},
+            'yaxis': {'title': {'text': f"Number of {species}"}}}}
+
+
+def build_vienna_pie(_: Any, window: tuple[int, int]) -> dict[str, Any]:
+    totals = season_ranges.group_totals(0, window)
+    return {
+        'data': [{
+            'hoverinfo': 'label+percent',
+            'labels': species_list,
+            'marker': {
+                'colors': [get_species_color(s) for s in species_list]},
+            'showlegend': True,
+            'textinfo': 'value',
+            'values': totals.tolist(),
+            'type': 'pie'}],
+        'layout': {
+            'legend': {
+                'orientation': 'v',
+                'traceorder': 'normal',
+                'x': 1.05,
+                'xanchor': 'left',
+                'y': 1,
+                'yanchor': 'top'},
+            'margin': {'b': 0, 'l': 0, 'r': 150, 't': 50},
+            'showlegend': True,
+            'template': TEMPLATE,
+            'title': {'text': "Artenverteilung VCF 2024"}}}
+
+
+FIGURE_BUILDERS: dict[
+        str, Callable[[Any, tuple[int, int]], dict[str, Any]]] = {
+    'participant_pie': build_participant_pie,
+    'sample_pie': build_sample_pie,
+    'time_series': build_time_series,
+    'vienna_pie': build_vienna_pie}
+
+
+@lru_cache(maxsize=4096)
+def get_figure(figure: str, key: Any = None,
+               window: tuple[int, int] = FULL_SEASON) -> dict[str, Any]:
+    """Plain figure dict, cached per (figure, key, time window). The
+    returned dict is shared and must not be modified."""
+    return FIGURE_BUILDERS[figure](key, window)
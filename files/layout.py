@@ -1,20 +1,47 @@
 from typing import Any
 
 import dash_leaflet as dl
-import plotly.graph_objects as go
 from dash import dash_table, dcc, html
 from dash.html import Div, Img
 from dash_leaflet import MapContainer
 
 from files.data import df, species_list
-from files.util import get_species_color
+from files.figures import get_figure
+from files.metrics import METRIC_COLUMNS
+from files.regions import region_layers
+from files.table import PAGE_SIZE, sample_table
+from files.tile_proxy import TILE_ATTRIBUTION, TILE_URL, asset_url
+from files.timerange import first_date, last_date
 
 
 def get_logo() -> Img:
-    logo = (
-        "https://fairicube.wp2.nilu.no/wp-content/uploads/sites/21/2024/04/"
-        "Logo-cityfly.png")
-    return html.Img(src=logo, style={'width': '200px'})
+    return html.Img(
+        src=asset_url('logo-cityfly.png'), style={'width': '200px'})
+
+
+def get_region_options() -> list[dict[str, str]]:
+    """Map layers to choose from, districts only if their boundaries are
+    available (see DISTRICTS_FILE)"""
+    options = [{'label': 'Fallen', 'value': 'none'}]
+    if region_layers['district']:
+        options.append({'label': 'Bezirke', 'value': 'district'})
+    options.append({'label': 'Hexagone', 'value': 'hex'})
+    return options
+
+
+def get_date_range() -> Div:
+    """Time window for all views, empty means the whole season"""
+    return html.Div(
+        style={'marginBottom': '10px'},
+        children=[
+            html.Label("Zeitraum: ", style={'marginRight': '10px'}),
+            dcc.DatePickerRange(
+                id='date-range',
+                min_date_allowed=first_date.date(),
+                max_date_allowed=last_date.date(),
+                initial_visible_month=first_date.date(),
+                display_format='DD.MM.YYYY',
+                clearable=True)])
 
 
 def get_participant_map_div() -> Div:
@@ -31,11 +58,16 @@ def get_participant_map_div() -> Div:
         children=[
             dcc.Dropdown(
                 id='participant-dropdown',
-                options=[
-                    {'label': p, 'value': p} for p in
-                    sorted(df['participants'].unique())],
+                # Optionen kommen per Suche vom Server (search_value)
+                options=[],
+                placeholder='Sammlernummer suchen',
                 value=None  # Initialer Wert
             ),
+            dcc.RadioItems(
+                id='region-level',
+                options=get_region_options(),
+                value='none',
+                inline=True),
             html.Div(
                 id='map-container',
                 style={
@@ -56,7 +88,10 @@ def get_participant_map_div() -> Div:
                     dl.Map(
                         id="map",
                         children=[
-                            dl.TileLayer(), dl.LayerGroup(id="markers")],
+                            dl.TileLayer(
+                                url=TILE_URL, attribution=TILE_ATTRIBUTION),
+                            dl.LayerGroup(id="regions"),
+                            dl.LayerGroup(id="markers")],
                         center=[
                             df["latitude"].mean(), df["longitude"].mean()],
                         zoom=10,
@@ -152,13 +187,19 @@ def get_species_details() -> Div:
                 dl.Map(
                     id="species-collection-map",
                     children=[
-                        dl.TileLayer(),
+                        dl.TileLayer(
+                            url=TILE_URL, attribution=TILE_ATTRIBUTION),
                         dl.LayerGroup(id="species-markers")],
                     center=[df["latitude"].mean(), df["longitude"].mean()],
                     # Verwende den Durchschnitt aller Koordinaten als
                     # initialen Center
                     zoom=8,
-                    style={"height": "600px", "width": "100%"})])])
+                    style={"height": "600px", "width": "100%"}),
+                html.Div(
+                    id='nearby-sites',
+                    style={'padding': '10px'},
+                    children="Klicke auf die Karte, um Fallen in der Nähe "
+                             "mit der gewählten Art zu finden.")])])
 
 
 def get_footer() -> Div:
@@ -227,7 +268,7 @@ def get_footer() -> Div:
                 href="https://fairicube.nilu.no",
                 target="_blank",
                 children=html.Img(
-                    src="https://fairicube.nilu.no/wp-content/uploads/sites/21/2022/09/fairicube_logo_200x149.jpg",
+                    src=asset_url('fairicube-logo.jpg'),
                     style={
                         'marginTop': '10px',
                         'height': '50px',  # Optional: verkleinern
@@ -288,6 +329,7 @@ def layout() -> Div:
                     )
                 ]
             ),
+            get_date_range(),
             # Die restlichen Komponenten bleiben unverändert
             get_participant_map_div(),
             get_sample_table(),
@@ -303,7 +345,8 @@ def participant_map() -> MapContainer:
     return dl.Map(
         id="map",
         children=[
-            dl.TileLayer(),
+            dl.TileLayer(
+                url=TILE_URL, attribution=TILE_ATTRIBUTION),
             # Stelle sicher, dass dies vorhanden ist
             dl.LayerGroup(id="markers")],
         center=[df["latitude"].mean(), df["longitude"].mean()],
@@ -319,6 +362,7 @@ def participant_map() -> MapContainer:
 
 
 def get_sample_table() -> Div:
+    data, page_count = sample_table.query(None, 0, PAGE_SIZE, [], '')
     return html.Div(
         children=[
             html.H3("Artenverteilung nach Falle"),
@@ -326,8 +370,14 @@ def get_sample_table() -> Div:
                 id='species-table',
                 columns=[
                     {'name': 'Sample ID', 'id': 'sampleId'},
-                    *[{'name': species, 'id': species} for species in species_list],
-                    {'name': 'Total per Sample', 'id': 'Total per Sample'},
+                    # Zahlenspalten, damit die Filterzeile "=" statt
+                    # "contains" sendet
+                    *[{'name': species, 'id': species, 'type': 'numeric'}
+                      for species in species_list],
+                    {'name': 'Total per Sample', 'id': 'Total per Sample',
+                     'type': 'numeric'},
+                    *[{'name': metric, 'id': metric, 'type': 'numeric'}
+                      for metric in METRIC_COLUMNS],
                 ],
                 style_table={'height': '400px', 'overflowY': 'auto'},
                 style_cell={
@@ -339,7 +389,17 @@ def get_sample_table() -> Div:
                     'backgroundColor': 'lightgray',
                     'fontWeight': 'bold'
                 },
-                data=df.to_dict('records')
+                # Paging, Sortierung und Filter serverseitig, damit nur die
+                # sichtbare Seite übertragen wird
+                page_action='custom',
+                sort_action='custom',
+                filter_action='custom',
+                page_current=0,
+                page_size=PAGE_SIZE,
+                page_count=page_count,
+                sort_by=[],
+                filter_query='',
+                data=data
             ),
             html.Div(style={'marginTop': '10px'}, children=[
                 dcc.RadioItems(
@@ -365,37 +425,6 @@ def get_sample_table() -> Div:
 
 
 def get_sample_pie_chart() -> html.Div:
-    # Berechnung der Gesamtanzahl der Fliegen pro Art (wenn nicht schon in der Datenvorbereitung erledigt)
-    species_counts = {species: df[species].sum() for species in species_list}
-
-    labels = list(species_counts.keys())  # Artennamen
-    values = list(species_counts.values())  # Häufigkeit der Arten
-
-    # Farbliste basierend auf den bereits definierten Farben (diese Farben wurden für die anderen Pie-Charts verwendet)
-    colors = [get_species_color(species) for species in labels]
-
-    # Pie-Chart erstellen
-    fig = go.Figure(data=[go.Pie(
-        labels=labels,
-        values=values,
-        marker=dict(colors=colors),  # Farben aus der bestehenden Farbliste
-        hoverinfo='label+percent',  # Beim Hover anzeigen
-        textinfo='value',  # Beschriftung mit Wert
-        showlegend=True,
-    )])
-    fig.update_layout(
-        title="Artenverteilung VCF 2024",
-        showlegend=True,
-        legend=dict(x=1.05,  # Position der Legende rechts
-                    y=1,
-                    traceorder='normal',
-                    orientation='v',  # Vertikale Legende
-                    xanchor='left',
-                    yanchor='top'
-                    ),
-        margin=dict(l=0, r=150, b=0, t=50)
-    )
-
     return html.Div(
         children=[
             html.H3('Die Verteilung der Arten', style={'padding': '10px'}),
@@ -414,9 +443,13 @@ def get_sample_pie_chart() -> html.Div:
                     dcc.Graph(
                         id='participant-species-pie-chart',
                         style={'flex': '1', 'height': '400px', 'width': '400px'}),  # Pie-Chart für Participant
+                    # Teilnehmer mit ähnlicher Artenzusammensetzung
+                    html.Div(
+                        id='similar-participants',
+                        style={'flex': '0 0 220px'}),
                     dcc.Graph(
                         id='vienna-pie-chart',  # Pie-Chart für Projekt
-                        figure=fig,  # Direkt die Figure einfügen
+                        figure=get_figure('vienna_pie'),
                         style={'flex': '1', 'height': '400px', 'width': '400px'}),
                 ]
             )
@@ -453,7 +486,8 @@ def species_map() -> list[Any]:
         dl.Map(
             id="species-collection-map",
             children=[
-                dl.TileLayer(),
+                dl.TileLayer(
+                    url=TILE_URL, attribution=TILE_ATTRIBUTION),
                 dl.FitBounds(children=dl.LayerGroup(id="species-markers"))],
             # Diese Standardeinstellungen werden überschrieben,
             # wenn Bounds vorhanden sind
@@ -0,0 +1,73 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from files.data import dataset_version, df, species_list
+from files.timerange import FULL_SEASON, participant_ranges, season_ranges
+
+METRIC_COLUMNS = ['Richness', 'Shannon', 'Simpson', 'Evenness']
+
+
+def diversity(counts: np.ndarray) -> dict[str, np.ndarray]:
+    """Richness, Shannon, Simpson (1 - D) and Pielou evenness per row of a
+    (groups x species) count matrix"""
+    counts = np.asarray(counts, dtype=float)
+    totals = counts.sum(axis=1, keepdims=True)
+    proportions = np.divide(
+        counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+    richness = np.count_nonzero(counts, axis=1)
+    log_p = np.log(proportions, out=np.zeros_like(proportions),
+                   where=proportions > 0)
+    shannon = -(proportions * log_p).sum(axis=1)
+    simpson = np.where(
+        totals[:, 0] > 0, 1 - (proportions ** 2).sum(axis=1), 0.0)
+    log_richness = np.log(np.maximum(richness, 1))
+    evenness = np.divide(
+        shannon, log_richness, out=np.zeros_like(shannon),
+        where=richness > 1)
+    return {
+        'Richness': richness,
+        'Shannon': shannon,
+        'Simpson': simpson,
+        'Evenness': evenness}
+
+
+def get_diversity_frame(counts: pd.DataFrame) -> pd.DataFrame:
+    """Diversity indices for every row of a species count table"""
+    values = diversity(counts[species_list].to_numpy())
+    metrics = pd.DataFrame(values, index=counts.index)
+    return metrics.round({'Shannon': 3, 'Simpson': 3, 'Evenness': 3})
+
+
+def get_diversity_series(counts: np.ndarray) -> pd.Series:
+    """Diversity indices of a single species count vector"""
+    return get_diversity_frame(
+        pd.DataFrame([counts], columns=species_list)).iloc[0]
+
+
+def get_participant_metrics(
+        participant: Any,
+        window: tuple[int, int] = FULL_SEASON) -> pd.Series:
+    """Indices of a participant, precomputed for the whole season and
+    computed from the range totals for a time window"""
+    if window == FULL_SEASON and participant in participant_metrics.index:
+        return participant_metrics.loc[participant]
+    return get_diversity_series(
+        participant_ranges.group_totals(participant, window))
+
+
+def get_season_metrics(window: tuple[int, int] = FULL_SEASON) -> pd.Series:
+    """Indices of all samples together within the time window"""
+    if window == FULL_SEASON:
+        return season_metrics
+    return get_diversity_series(season_ranges.group_totals(0, window))
+
+
+# Indizes für Teilnehmer, Samples und die ganze Saison einmal beim Laden
+participant_metrics = get_diversity_frame(participant_ranges.totals())
+sample_metrics = get_diversity_frame(
+    df.groupby('sampleId')[species_list].sum())
+season_metrics = get_diversity_series(season_ranges.group_totals(0))
+print(f"Diversitätsindizes berechnet (Datenstand {dataset_version})")
@@ -0,0 +1,112 @@
+"""Prerenders all dashboard views into compressed JSON files plus a static
+shell, so the public site can be served by any static file server.
+
+Usage: python -m files.prerender [output_dir]
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Any
+
+from plotly.utils import PlotlyJSONEncoder
+
+from files.data import dataset_version, df, species_list
+from files.figures import get_figure
+from files.regions import region_layers
+from files.similarity import similar_participants
+from files.table import sample_table
+from files.views import get_participant_view, get_species_markers
+
+OUTPUT_DIR = "build"
+SHELL_FILE = os.path.join(os.path.dirname(__file__), "templates",
+                          "static_index.html")
+
+
+def file_key(value: str) -> str:
+    """Filesystem and URL safe name for participant and sample IDs"""
+    return hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:16]
+
+
+def write_json(path: str, data: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    content = json.dumps(data, cls=PlotlyJSONEncoder, separators=(',', ':'))
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=9) as file:
+        file.write(content)
+
+
+def to_json_data(component: Any) -> Any:
+    """Components, figures and numpy values as plain JSON data"""
+    return json.loads(json.dumps(component, cls=PlotlyJSONEncoder))
+
+
+def strip_marker_id(marker: dict[str, Any]) -> dict[str, Any]:
+    # Marker-IDs sind zufällig und für die statische Seite bedeutungslos
+    props = {k: v for k, v in marker['props'].items() if k != 'id'}
+    return {**marker, 'props': props}
+
+
+def build(output_dir: str = OUTPUT_DIR) -> None:
+    data_dir = os.path.join(output_dir, 'data')
+    if os.path.isdir(data_dir):
+        shutil.rmtree(data_dir)
+
+    # Grundzustand ohne Auswahl; pro Teilnehmer nur abweichende Marker
+    base_view = get_participant_view(None)
+    base_markers = [
+        strip_marker_id(marker)
+        for marker in to_json_data(base_view['markers'])]
+    overview = {
+        'version': dataset_version,
+        'species': species_list,
+        'markers': base_markers,
+        'center': base_view['center'],
+        'zoom': base_view['zoom'],
+        'vienna_pie': get_figure('vienna_pie'),
+        'regions': region_layers,
+        'participants': {},
+        'samples': {}}
+
+    participants = sorted(df['participants'].unique())
+    for participant in participants:
+        key = file_key(participant)
+        view = get_participant_view(participant)
+        changed = {
+            index: marker for index, marker in enumerate(
+                strip_marker_id(marker)
+                for marker in to_json_data(view['markers']))
+            if marker != base_markers[index]}
+        write_json(os.path.join(data_dir, 'participants', f'{key}.json.gz'), {
+            'markers': changed,
+            'center': view['center'],
+            'zoom': view['zoom'],
+            'sample_options': view['sample_options'],
+            'table': sample_table.all_records(participant),
+            'pie': view['pie'],
+            'similar': similar_participants(participant)})
+        overview['participants'][str(participant)] = key
+
+    for sample in df['sampleId'].unique():
+        key = file_key(sample)
+        write_json(os.path.join(data_dir, 'samples', f'{key}.json.gz'), {
+            'pie': get_figure('sample_pie', sample)})
+        overview['samples'][str(sample)] = key
+
+    for species in species_list:
+        markers, bounds = get_species_markers(species)
+        write_json(os.path.join(data_dir, 'species', f'{species}.json.gz'), {
+            'time_series': get_figure('time_series', species),
+            'markers': [strip_marker_id(m) for m in to_json_data(markers)],
+            'bounds': bounds})
+
+    write_json(os.path.join(data_dir, 'overview.json.gz'), overview)
+    shutil.copy(SHELL_FILE, os.path.join(output_dir, 'index.html'))
+    print(f"Statische Seite für Datenstand {dataset_version} in "
+          f"{output_dir}: {len(participants)} Teilnehmer, "
+          f"{len(overview['samples'])} Samples, {len(species_list)} Arten")
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR)
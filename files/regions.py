@@ -0,0 +1,240 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any
+
+import dash_leaflet as dl
+import numpy as np
+import pandas as pd
+from dash_leaflet import Polygon
+
+from files.data import df, species_list
+from files.metrics import get_diversity_frame
+from files.timerange import FULL_SEASON, RangeTotals
+from files.util import get_scaled_color
+
+# Bezirksgrenzen Wien (z.B. BEZIRKSGRENZEOGD von data.wien.gv.at)
+DISTRICTS_FILE = os.environ.get("DISTRICTS_FILE", "bezirke.geojson")
+DISTRICT_NAME_KEYS = ('NAMEK', 'NAME', 'name')
+
+# Hexagon-Raster ähnlich H3 Auflösung 7 (~1,2 km Kantenlänge), mit festem
+# Ursprung in Wien, damit die Zellen über Datenstände hinweg stabil bleiben
+HEX_EDGE_KM = 1.22
+HEX_ORIGIN = (48.2082, 16.3738)
+KM_PER_DEGREE = 111.32
+
+# Maximale Anzahl Punkt/Kante-Paare pro Block beim Point-in-Polygon-Test
+PIP_BLOCK_SIZE = 2_000_000
+
+
+def load_districts(path: str = DISTRICTS_FILE) -> list[dict[str, Any]]:
+    """Loads district polygons as lists of [lon, lat] rings per district"""
+    if not os.path.exists(path):
+        print(f"Keine Bezirksgrenzen gefunden ({path}), nur Hexagone aktiv")
+        return []
+    with open(path, encoding='utf-8') as file:
+        features = json.load(file).get('features', [])
+
+    districts = []
+    for index, feature in enumerate(features):
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+        properties = feature.get('properties') or {}
+        name = next(
+            (str(properties[key]) for key in DISTRICT_NAME_KEYS
+             if properties.get(key)),
+            f"Bezirk {index + 1}")
+        districts.append({
+            'name': name,
+            'rings': [
+                np.asarray(ring, dtype=float)[:, :2]
+                for polygon in polygons for ring in polygon]})
+    return districts
+
+
+def points_in_rings(
+        lons: np.ndarray,
+        lats: np.ndarray,
+        rings: list[np.ndarray]) -> np.ndarray:
+    """Even-odd ray casting for all points against all edges at once"""
+    starts = np.concatenate(rings)
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    x1, y1 = starts[:, 0], starts[:, 1]
+    x2, y2 = ends[:, 0], ends[:, 1]
+    # Horizontale Kanten werden nie gekreuzt, Division durch 0 vermeiden
+    dy = np.where(y2 == y1, np.inf, y2 - y1)
+
+    inside = np.zeros(len(lons), dtype=bool)
+    block = max(1, PIP_BLOCK_SIZE // max(len(starts), 1))
+    for start in range(0, len(lons), block):
+        px = lons[start:start + block, None]
+        py = lats[start:start + block, None]
+        spans = (y1 > py) != (y2 > py)
+        x_cross = x1 + (py - y1) * (x2 - x1) / dy
+        crossings = np.count_nonzero(spans & (px < x_cross), axis=1)
+        inside[start:start + block] = crossings % 2 == 1
+    return inside
+
+
+def assign_districts(
+        lons: np.ndarray,
+        lats: np.ndarray,
+        districts: list[dict[str, Any]]) -> np.ndarray:
+    """Returns the district name per point (None outside all districts)"""
+    result = np.full(len(lons), None, dtype=object)
+    for district in districts:
+        unassigned = np.flatnonzero(pd.isna(result))
+        if not len(unassigned):
+            break
+        inside = points_in_rings(
+            lons[unassigned], lats[unassigned], district['rings'])
+        result[unassigned[inside]] = district['name']
+    return result
+
+
+def _to_km(lats: np.ndarray, lons: np.ndarray) -> tuple[Any, Any]:
+    lat0, lon0 = HEX_ORIGIN
+    x = (lons - lon0) * KM_PER_DEGREE * np.cos(np.radians(lat0))
+    y = (lats - lat0) * KM_PER_DEGREE
+    return x, y
+
+
+def _to_degrees(x: np.ndarray, y: np.ndarray) -> tuple[Any, Any]:
+    lat0, lon0 = HEX_ORIGIN
+    lats = lat0 + y / KM_PER_DEGREE
+    lons = lon0 + x / (KM_PER_DEGREE * np.cos(np.radians(lat0)))
+    return lats, lons
+
+
+def assign_hex_cells(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Returns the axial hex cell id ("hex:q:r") per point (pointy top)"""
+    x, y = _to_km(lats, lons)
+    q = (np.sqrt(3) / 3 * x - y / 3) / HEX_EDGE_KM
+    r = (2 / 3 * y) / HEX_EDGE_KM
+
+    # Runden in Würfelkoordinaten, größten Rundungsfehler korrigieren
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    return np.char.add(
+        np.char.add('hex:', rq.astype(int).astype(str)),
+        np.char.add(':', rr.astype(int).astype(str))).astype(object)
+
+
+def hex_cell_boundary(cell: str) -> list[list[float]]:
+    """Returns the six [lat, lon] corners of a hex cell"""
+    _, q, r = cell.split(':')
+    q, r = int(q), int(r)
+    cx = HEX_EDGE_KM * (np.sqrt(3) * q + np.sqrt(3) / 2 * r)
+    cy = HEX_EDGE_KM * 1.5 * r
+    angles = np.radians(30 + 60 * np.arange(6))
+    lats, lons = _to_degrees(
+        cx + HEX_EDGE_KM * np.cos(angles), cy + HEX_EDGE_KM * np.sin(angles))
+    return [[float(lat), float(lon)] for lat, lon in zip(lats, lons)]
+
+
+def get_region_totals(
+        ranges: RangeTotals,
+        window: tuple[int, int] = FULL_SEASON) -> pd.DataFrame:
+    """Species totals, total flies, sample count and diversity indices per
+    region with samples within the window"""
+    totals = ranges.totals(window)
+    totals['total_flies'] = totals[species_list].sum(axis=1)
+    totals['samples'] = ranges.sizes(window)
+    totals = totals[totals['samples'] > 0]
+    return totals.join(get_diversity_frame(totals))
+
+
+def make_region_polygon(
+        region: str,
+        positions: list[Any],
+        totals: pd.Series,
+        max_total: float) -> Polygon:
+    top_species = totals[species_list].idxmax() \
+        if totals['total_flies'] else '-'
+    return dl.Polygon(
+        positions=positions,
+        color='#555',
+        weight=1,
+        fillColor=get_scaled_color(totals['total_flies'], 0, max_total),
+        fillOpacity=0.5,
+        children=dl.Tooltip(
+            f"{region}: {int(totals['total_flies'])} flies in "
+            f"{int(totals['samples'])} samples (most: {top_species}), "
+            f"{int(totals['Richness'])} species, "
+            f"Shannon {totals['Shannon']:.3f}, "
+            f"Simpson {totals['Simpson']:.3f}, "
+            f"Evenness {totals['Evenness']:.3f}"))
+
+
+def get_district_layer(window: tuple[int, int]) -> list[Polygon]:
+    district_totals = get_region_totals(district_ranges, window)
+    max_total = district_totals['total_flies'].max() \
+        if len(district_totals) else 0
+    layer = []
+    for district in districts:
+        if district['name'] not in district_totals.index:
+            continue
+        layer.append(make_region_polygon(
+            district['name'],
+            [ring[:, ::-1].tolist() for ring in district['rings']],
+            district_totals.loc[district['name']],
+            max_total))
+    return layer
+
+
+def get_hex_layer(window: tuple[int, int]) -> list[Polygon]:
+    hex_totals = get_region_totals(hex_ranges, window)
+    max_total = hex_totals['total_flies'].max() if len(hex_totals) else 0
+    return [
+        make_region_polygon(
+            cell, hex_cell_boundary(cell), totals, max_total)
+        for cell, totals in hex_totals.iterrows()]
+
+
+# Zuordnung aller Samples in einem Durchlauf beim Laden, über die
+# eindeutigen Koordinaten (viele Samples teilen sich eine Falle)
+districts = load_districts()
+_coordinates, _inverse = np.unique(
+    df[['longitude', 'latitude']].to_numpy(dtype=float),
+    axis=0,
+    return_inverse=True)
+_inverse = _inverse.ravel()
+sample_district = pd.Series(
+    assign_districts(_coordinates[:, 0], _coordinates[:, 1], districts)[
+        _inverse],
+    index=df.index,
+    name='district')
+sample_hex = pd.Series(
+    assign_hex_cells(_coordinates[:, 1], _coordinates[:, 0])[_inverse],
+    index=df.index,
+    name='hex_cell')
+
+district_ranges = RangeTotals(sample_district)
+hex_ranges = RangeTotals(sample_hex)
+
+REGION_LAYERS = {'district': get_district_layer, 'hex': get_hex_layer}
+
+
+@lru_cache(maxsize=256)
+def get_region_layer(
+        level: str,
+        window: tuple[int, int] = FULL_SEASON) -> list[Polygon]:
+    """Choropleth of districts or hex cells for the time window"""
+    if level not in REGION_LAYERS:
+        return []
+    return REGION_LAYERS[level](window)
+
+
+# Gesamtsaison vorberechnet, z.B. für die statische Seite
+region_layers = {level: get_region_layer(level) for level in REGION_LAYERS}
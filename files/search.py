@@ -0,0 +1,59 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any
+
+from files.data import df
+
+SEARCH_LIMIT = 20
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ParticipantIndex:
+    """Sorted prefix index plus trigram index over participant IDs"""
+
+    def __init__(self, participants: list[str]) -> None:
+        self.entries = sorted((str(p).lower(), p) for p in participants)
+        self.keys = [key for key, _ in self.entries]
+        self.trigrams: dict[str, set[int]] = defaultdict(set)
+        for position, key in enumerate(self.keys):
+            for trigram in trigrams(key):
+                self.trigrams[trigram].add(position)
+
+    def prefix_matches(self, query: str, limit: int) -> list[int]:
+        start = bisect_left(self.keys, query)
+        end = start
+        while end < len(self.keys) and end - start < limit \
+                and self.keys[end].startswith(query):
+            end += 1
+        return list(range(start, end))
+
+    def substring_matches(self, query: str, limit: int) -> list[int]:
+        """Positions containing query anywhere, narrowed by trigrams"""
+        if len(query) < 3:
+            return []
+        candidates = set.intersection(
+            *(self.trigrams.get(t, set()) for t in trigrams(query)))
+        return sorted(
+            position for position in candidates
+            if query in self.keys[position])[:limit]
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list[Any]:
+        """Participant IDs starting with query first, then those
+        containing it, case-insensitive"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        positions = self.prefix_matches(query, limit)
+        if len(positions) < limit:
+            seen = set(positions)
+            positions += [
+                position for position in self.substring_matches(
+                    query, limit + len(positions))
+                if position not in seen][:limit - len(positions)]
+        return [self.entries[position][1] for position in positions]
+
+
+participant_index = ParticipantIndex(list(df['participants'].unique()))
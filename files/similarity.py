@@ -0,0 +1,76 @@
+from typing import Any
+
+import numpy as np
+
+from files.data import dataset_version, species_list
+from files.timerange import participant_ranges
+
+SIMILAR_COUNT = 5
+# Obergrenze für die Einträge eines Zwischenblocks (Zeilen x Teilnehmer x
+# Arten), etwa 32 MB bei float64
+BLOCK_ELEMENTS = 2 ** 22
+
+
+def bray_curtis(block: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Bray-Curtis dissimilarity between every row of block and matrix"""
+    shared = np.minimum(block[:, np.newaxis, :], matrix[np.newaxis, :, :]) \
+        .sum(axis=2)
+    totals = block.sum(axis=1)[:, np.newaxis] + matrix.sum(axis=1)
+    # Zwei leere Fallen gelten als völlig verschieden
+    return 1 - np.divide(
+        2 * shared, totals, out=np.zeros_like(shared), where=totals > 0)
+
+
+def jaccard(block: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Jaccard dissimilarity of species presence between every row of block
+    and matrix"""
+    block_present = (block > 0).astype(float)
+    present = (matrix > 0).astype(float)
+    shared = block_present @ present.T
+    union = block_present.sum(axis=1)[:, np.newaxis] + present.sum(axis=1) \
+        - shared
+    return 1 - np.divide(
+        shared, union, out=np.zeros_like(shared), where=union > 0)
+
+
+def get_similar_participants() -> dict[Any, list[dict[str, Any]]]:
+    """Most similar participants by Bray-Curtis for every participant,
+    computed blockwise"""
+    totals = participant_ranges.totals()
+    participants = totals.index.to_numpy()
+    matrix = totals.to_numpy(dtype=float)
+    count = min(SIMILAR_COUNT, len(participants) - 1)
+    block_size = max(1, BLOCK_ELEMENTS // max(1, matrix.size))
+
+    similar: dict[Any, list[dict[str, Any]]] = {}
+    for start in range(0, len(participants), block_size):
+        block = matrix[start:start + block_size]
+        distances = bray_curtis(block, matrix)
+        jaccard_distances = jaccard(block, matrix)
+        rows = np.arange(len(block))
+        # Sich selbst nicht als ähnlichsten Teilnehmer vorschlagen
+        distances[rows, rows + start] = np.inf
+        if count < 1:
+            nearest = np.empty((len(block), 0), dtype=int)
+        else:
+            nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            order = np.argsort(
+                distances[rows[:, np.newaxis], nearest], axis=1, kind='stable')
+            nearest = np.take_along_axis(nearest, order, axis=1)
+        for row, neighbours in zip(rows, nearest):
+            similar[participants[start + row]] = [
+                {'participant': participants[neighbour],
+                 'bray_curtis': round(float(distances[row, neighbour]), 3),
+                 'jaccard': round(float(jaccard_distances[row, neighbour]), 3)}
+                for neighbour in neighbours]
+    print(f"Ähnliche Teilnehmer berechnet ({len(participants)} Teilnehmer, "
+          f"{len(species_list)} Arten, Datenstand {dataset_version})")
+    return similar
+
+
+def similar_participants(participant: Any) -> list[dict[str, Any]]:
+    return similar_by_participant.get(participant, [])
+
+
+# Paarweiser Vergleich einmal beim Laden
+similar_by_participant = get_similar_participants()
@@ -0,0 +1,107 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from files.data import df, species_list
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def get_sites() -> pd.DataFrame:
+    """One row per trap site (participant and location) with species
+    totals over all samples"""
+    sites = df.groupby(
+        ['participants', 'latitude', 'longitude'], as_index=False)[
+        species_list].sum()
+    sites['total_flies'] = sites[species_list].sum(axis=1)
+    return sites
+
+
+def to_unit_vectors(lats: Any, lons: Any) -> np.ndarray:
+    """Points on the unit sphere; chord distance is monotonic with the
+    haversine distance, so a euclidean tree answers great-circle queries"""
+    lat, lon = np.radians(lats), np.radians(lons)
+    return np.column_stack([
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat)])
+
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def km_to_chord(distance_km: float) -> float:
+    return 2 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class SiteIndex:
+    """KD-trees over the trap sites, one for all sites and one per species
+    with only the sites where that species was found"""
+
+    def __init__(self, sites: pd.DataFrame) -> None:
+        self.sites = sites
+        points = to_unit_vectors(sites['latitude'], sites['longitude'])
+        self.trees = {}
+        for species in [None, *species_list]:
+            positions = np.arange(len(sites)) if species is None \
+                else np.flatnonzero(sites[species].to_numpy() > 0)
+            tree = cKDTree(points[positions]) if len(positions) else None
+            self.trees[species] = (tree, positions)
+
+    def _results(
+            self,
+            positions: np.ndarray,
+            chords: np.ndarray,
+            species: str | None) -> list[dict[str, Any]]:
+        count_column = species or 'total_flies'
+        rows = self.sites.iloc[positions]
+        return [
+            {'participant': participant,
+             'latitude': float(lat),
+             'longitude': float(lon),
+             'distance_km': round(float(distance), 3),
+             'count': int(count)}
+            for participant, lat, lon, count, distance in zip(
+                rows['participants'],
+                rows['latitude'],
+                rows['longitude'],
+                rows[count_column],
+                chord_to_km(chords))]
+
+    def nearest(
+            self,
+            lat: float,
+            lon: float,
+            k: int = 5,
+            species: str | None = None) -> list[dict[str, Any]]:
+        """The k nearest sites, optionally only sites with the species"""
+        tree, positions = self.trees[species]
+        if tree is None or k < 1:
+            return []
+        chords, found = tree.query(
+            to_unit_vectors(lat, lon)[0], k=min(k, len(positions)))
+        chords, found = np.atleast_1d(chords), np.atleast_1d(found)
+        return self._results(positions[found], chords, species)
+
+    def within_radius(
+            self,
+            lat: float,
+            lon: float,
+            radius_km: float,
+            species: str | None = None) -> list[dict[str, Any]]:
+        """All sites within radius_km, sorted by distance"""
+        tree, positions = self.trees[species]
+        if tree is None:
+            return []
+        point = to_unit_vectors(lat, lon)[0]
+        found = np.asarray(
+            tree.query_ball_point(point, km_to_chord(radius_km)), dtype=int)
+        chords = np.linalg.norm(tree.data[found] - point, axis=1)
+        order = np.argsort(chords)
+        return self._results(positions[found[order]], chords[order], species)
+
+
+site_index = SiteIndex(get_sites())
@@ -0,0 +1,206 @@
+import re
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from files.data import df, species_list
+from files.metrics import (
+    get_participant_metrics, get_season_metrics, sample_metrics)
+from files.timerange import (
+    FULL_SEASON, day_numbers, participant_ranges, season_ranges)
+
+PAGE_SIZE = 25
+TOTAL_COLUMN = 'Total per Sample'
+HIDDEN_COLUMNS = ('participants', 'day')
+
+# Operatoren der DataTable-Filterzeile (filter_action='custom')
+FILTER_PATTERN = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s+(?P<case>[si])?(?P<operator>ge|le|lt|gt|ne|'
+    r'eq|contains|datestartswith|>=|<=|<|>|!=|=)\s+(?P<value>.*)$')
+OPERATOR_ALIASES = {
+    'ge': '>=', 'le': '<=', 'lt': '<', 'gt': '>', 'ne': '!=', 'eq': '='}
+
+
+def get_sample_rows() -> pd.DataFrame:
+    """One table row per sample with totals and diversity indices, in
+    the same order as the groupby in the participant view"""
+    rows = df.groupby('sampleId')[species_list].sum()
+    rows[TOTAL_COLUMN] = rows[species_list].sum(axis=1)
+    rows = rows.join(sample_metrics)
+    rows['participants'] = df.groupby('sampleId')['participants'].first()
+    # Sammeltag der Probe für das Zeitfenster
+    rows['day'] = pd.Series(day_numbers, index=df.index).groupby(
+        df['sampleId']).min()
+    return rows.reset_index()
+
+
+def get_total_row(counts: np.ndarray, label: str,
+                  metrics: pd.Series) -> dict[str, Any]:
+    row = {'sampleId': label, **dict(zip(species_list, counts.tolist()))}
+    row[TOTAL_COLUMN] = int(counts.sum())
+    row.update(metrics.to_dict())
+    row['Richness'] = int(row['Richness'])
+    return row
+
+
+def parse_value(value: str) -> str:
+    """Filter value as typed, without surrounding quotes"""
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+        return value[1:-1]
+    return value
+
+
+class SampleTable:
+    """Sample rows with one pre-sorted index per column, so paging,
+    sorting and filtering only slice arrays instead of copying frames"""
+
+    def __init__(self, rows: pd.DataFrame) -> None:
+        self.rows = rows
+        self.columns = [
+            c for c in rows.columns if c not in HIDDEN_COLUMNS]
+        self.order = {}
+        self.sorted_values = {}
+        self.rank = {}
+        for column in [*self.columns, 'day']:
+            values = rows[column].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            order = np.argsort(values, kind='stable')
+            self.order[column] = order
+            self.sorted_values[column] = values[order]
+            # Gleiche Werte teilen sich einen Rang, damit weitere
+            # Sortierspalten Gleichstände auflösen
+            self.rank[column] = np.unique(values, return_inverse=True)[1]
+        self.participant_positions = rows.groupby('participants').indices
+
+    def filter_mask(self, filter_query: str | None) -> np.ndarray | None:
+        """Boolean mask over all rows for a DataTable filter query"""
+        if not filter_query:
+            return None
+        mask = np.ones(len(self.rows), dtype=bool)
+        for part in filter_query.split(' && '):
+            match = FILTER_PATTERN.match(part.strip())
+            if not match or match['column'] not in self.order:
+                continue
+            mask &= self.condition(
+                match['column'],
+                match['operator'],
+                parse_value(match['value']),
+                match['case'] == 'i')
+        return mask
+
+    def condition(self, column: str, operator: str, value: str,
+                  ignore_case: bool = False) -> np.ndarray:
+        operator = OPERATOR_ALIASES.get(operator, operator)
+        result = np.zeros(len(self.rows), dtype=bool)
+        sorted_values = self.sorted_values[column]
+        if operator in ('contains', 'datestartswith') \
+                or sorted_values.dtype.kind in 'US':
+            # Textvergleiche immer mit dem eingegebenen Text, nie mit der
+            # Zahl, sonst sucht "101" nach "101.0"
+            values = self.rows[column].astype(str)
+            text = value
+            if ignore_case:
+                values, text = values.str.lower(), text.lower()
+            if operator == 'contains':
+                return values.str.contains(text, regex=False).to_numpy()
+            if operator == 'datestartswith':
+                return values.str.startswith(text).to_numpy()
+            matches = {
+                '=': values == text, '!=': values != text,
+                '<': values < text, '<=': values <= text,
+                '>': values > text, '>=': values >= text}
+            return matches[operator].to_numpy()
+        try:
+            number = float(value)
+        except ValueError:
+            return result
+
+        # Numerische Vergleiche per Binärsuche im vorsortierten Index
+        left = np.searchsorted(sorted_values, number, side='left')
+        right = np.searchsorted(sorted_values, number, side='right')
+        selected = {
+            '=': slice(left, right), '<': slice(0, left),
+            '<=': slice(0, right), '>': slice(right, None),
+            '>=': slice(left, None)}
+        if operator == '!=':
+            result[:] = True
+            result[self.order[column][left:right]] = False
+        else:
+            result[self.order[column][selected[operator]]] = True
+        return result
+
+    def window_mask(self, window: tuple[int, int]) -> np.ndarray:
+        """Samples collected within the window, via the day index"""
+        days = self.sorted_values['day']
+        start = np.searchsorted(days, window[0], side='left')
+        end = np.searchsorted(days, window[1], side='right')
+        mask = np.zeros(len(self.rows), dtype=bool)
+        mask[self.order['day'][start:end]] = True
+        return mask
+
+    def sort_positions(self, positions: np.ndarray,
+                       sort_by: list[dict[str, str]] | None) -> np.ndarray:
+        sort_by = [s for s in sort_by or [] if s['column_id'] in self.rank]
+        if not sort_by:
+            return positions
+        # Ränge aus den vorsortierten Indizes; lexsort nimmt den letzten
+        # Schlüssel als primären
+        keys = [
+            self.rank[s['column_id']][positions]
+            * (-1 if s['direction'] == 'desc' else 1)
+            for s in reversed(sort_by)]
+        return positions[np.lexsort(keys)]
+
+    def query(
+            self,
+            participant: str | None,
+            page_current: int,
+            page_size: int,
+            sort_by: list[dict[str, str]] | None,
+            filter_query: str | None,
+            window: tuple[int, int] = FULL_SEASON) \
+            -> tuple[list[dict[str, Any]], int]:
+        """One page of the participant (or complete) view within the time
+        window with its total row last, and the resulting page count"""
+        if participant:
+            positions = self.participant_positions.get(
+                participant, np.array([], dtype=int))
+            total_row = get_total_row(
+                participant_ranges.group_totals(participant, window),
+                'Total per Participant',
+                get_participant_metrics(participant, window)) \
+                if participant in participant_ranges.codes else None
+        else:
+            positions = np.arange(len(self.rows))
+            total_row = get_total_row(
+                season_ranges.group_totals(0, window),
+                'Total',
+                get_season_metrics(window))
+        mask = self.filter_mask(filter_query)
+        if window != FULL_SEASON:
+            in_window = self.window_mask(window)
+            mask = in_window if mask is None else mask & in_window
+        if mask is not None:
+            positions = positions[mask[positions]]
+        positions = self.sort_positions(positions, sort_by)
+
+        total = len(positions) + (total_row is not None)
+        page_count = max(1, -(-total // page_size))
+        start = page_current * page_size
+        page = self.rows.iloc[positions[start:start + page_size]][
+            self.columns].to_dict('records')
+        if total_row is not None \
+                and start <= len(positions) < start + page_size:
+            page.append(total_row)
+        return page, page_count
+
+    def all_records(self, participant: str) -> list[dict[str, Any]]:
+        """Unpaged participant view, e.g. for prerendering"""
+        records, _ = self.query(participant, 0, len(self.rows) + 1, None, None)
+        return records
+
+
+sample_table = SampleTable(get_sample_rows())
@@ -0,0 +1,267 @@
+"""Caching proxy for map tiles and external images.
+
+Tiles and hotlinked logos are fetched once from upstream, kept in an
+on-disk LRU cache and revalidated with ETag/Last-Modified when stale. In
+offline mode (TILE_PROXY_OFFLINE=1) only the cache is served.
+
+Seed the cache for Vienna: python -m files.tile_proxy seed
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+
+import requests
+from flask import Blueprint, Response, abort, request
+
+TILE_UPSTREAM = os.environ.get(
+    "TILE_UPSTREAM", "https://tile.openstreetmap.org/{z}/{x}/{y}.png")
+TILE_URL = "/tiles/{z}/{x}/{y}.png"
+TILE_ATTRIBUTION = (
+    '&copy; <a href="https://www.openstreetmap.org/copyright">'
+    'OpenStreetMap</a> contributors')
+CACHE_DIR = os.environ.get("TILE_CACHE_DIR", os.path.join("cache", "tiles"))
+CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", 500 * 2 ** 20))
+OFFLINE = os.environ.get("TILE_PROXY_OFFLINE", "0") == "1"
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+TIMEOUT = 10
+USER_AGENT = (
+    "Fruchtfliegen (https://github.com/BernhardKoschicek/fruchtfliege)")
+
+# Extern gehostete Bilder aus Header und Footer
+EXTERNAL_ASSETS = {
+    'logo-cityfly.png':
+        "https://fairicube.wp2.nilu.no/wp-content/uploads/sites/21/2024/04/"
+        "Logo-cityfly.png",
+    'fairicube-logo.jpg':
+        "https://fairicube.nilu.no/wp-content/uploads/sites/21/2022/09/"
+        "fairicube_logo_200x149.jpg"}
+
+# Wien mit Umland und die in den Karten verwendeten Zoomstufen
+VIENNA_BOUNDS = ((48.10, 16.18), (48.33, 16.58))
+SEED_ZOOM_LEVELS = (6, 8, 10, 11, 12, 13)
+
+
+def asset_url(name: str) -> str:
+    return f"/external-assets/{name}"
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Writes to a unique temporary file first, so parallel readers never
+    see half files and parallel writers never share a temporary file"""
+    handle, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.",
+        suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class DiskCache:
+    """File per entry with a JSON sidecar; file mtime is the LRU clock"""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size: int | None = None
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        path = os.path.join(self.directory, *key.split('/'))
+        return path, f"{path}.json"
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(('.json', '.tmp')):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _current_size(self) -> int:
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        return self.size
+
+    def get(self, key: str) -> tuple[bytes, dict[str, Any]] | None:
+        path, meta_path = self._paths(key)
+        try:
+            with open(path, 'rb') as file:
+                content = file.read()
+            with open(meta_path, encoding='utf-8') as file:
+                meta = json.load(file)
+            os.utime(path)  # Als zuletzt benutzt markieren
+        except (OSError, ValueError):
+            return None
+        return content, meta
+
+    def put(self, key: str, content: bytes, meta: dict[str, Any]) -> None:
+        path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            size = self._current_size()
+            if os.path.exists(path):
+                size -= os.path.getsize(path)
+            write_atomic(path, content)
+            write_atomic(meta_path, json.dumps(meta).encode())
+            self.size = size + len(content)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def put_meta(self, key: str, meta: dict[str, Any]) -> None:
+        path, meta_path = self._paths(key)
+        with self.lock:
+            # Inzwischen verdrängte Einträge nicht wiederbeleben
+            if os.path.exists(path):
+                write_atomic(meta_path, json.dumps(meta).encode())
+
+    def evict(self) -> None:
+        """Removes least recently used entries down to 90% of the limit"""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            for stale in (path, f"{path}.json"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+            size -= entry_size
+        self.size = size
+
+
+cache = DiskCache(CACHE_DIR, CACHE_MAX_BYTES)
+
+
+def get_max_age(headers: Any) -> int:
+    match = re.search(r'max-age=(\d+)', headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+def is_fresh(meta: dict[str, Any]) -> bool:
+    return time.time() - meta['fetched_at'] < meta['max_age']
+
+
+def fetch(key: str, url: str, offline: bool | None = None) \
+        -> tuple[bytes, dict[str, Any]] | None:
+    """Cached content for key; revalidates stale entries upstream and
+    falls back to the stale copy if upstream is unreachable"""
+    offline = OFFLINE if offline is None else offline
+    cached = cache.get(key)
+    if cached and (offline or is_fresh(cached[1])):
+        return cached
+    if offline:
+        return None
+
+    headers = {'User-Agent': USER_AGENT}
+    if cached:
+        if cached[1].get('upstream_etag'):
+            headers['If-None-Match'] = cached[1]['upstream_etag']
+        if cached[1].get('last_modified'):
+            headers['If-Modified-Since'] = cached[1]['last_modified']
+    try:
+        response = requests.get(url, headers=headers, timeout=TIMEOUT)
+    except requests.RequestException:
+        return cached
+
+    if response.status_code == 304 and cached:
+        content, meta = cached
+        meta.update(
+            fetched_at=time.time(), max_age=get_max_age(response.headers))
+        cache.put_meta(key, meta)
+        return content, meta
+    if response.status_code != 200:
+        return cached
+
+    content = response.content
+    meta = {
+        'etag': hashlib.sha1(content).hexdigest(),
+        'upstream_etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get(
+            'Content-Type', 'application/octet-stream'),
+        'fetched_at': time.time(),
+        'max_age': get_max_age(response.headers)}
+    cache.put(key, content, meta)
+    return content, meta
+
+
+def make_cached_response(content: bytes, meta: dict[str, Any]) -> Response:
+    response = Response(content, mimetype=meta['content_type'])
+    response.set_etag(meta['etag'])
+    response.cache_control.public = True
+    response.cache_control.max_age = meta['max_age']
+    return response.make_conditional(request)
+
+
+tile_proxy = Blueprint('tile_proxy', __name__)
+
+
+@tile_proxy.route('/tiles/<int:z>/<int:x>/<int:y>.png')
+def get_tile(z: int, x: int, y: int) -> Response:
+    if not 0 <= z <= 19 or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        abort(404)
+    result = fetch(f"{z}/{x}/{y}.png", TILE_UPSTREAM.format(z=z, x=x, y=y))
+    if result is None:
+        abort(404 if OFFLINE else 502)
+    return make_cached_response(*result)
+
+
+@tile_proxy.route('/external-assets/<name>')
+def get_external_asset(name: str) -> Response:
+    if name not in EXTERNAL_ASSETS:
+        abort(404)
+    result = fetch(f"assets/{name}", EXTERNAL_ASSETS[name])
+    if result is None:
+        abort(404 if OFFLINE else 502)
+    return make_cached_response(*result)
+
+
+def tile_range(lat: float, lon: float, zoom: int) -> tuple[int, int]:
+    """Slippy map tile numbers containing a coordinate"""
+    n = 2 ** zoom
+    x = int((lon + 180) / 360 * n)
+    lat_rad = math.radians(lat)
+    y = int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)
+    return min(x, n - 1), min(y, n - 1)
+
+
+def seed(bounds: tuple[tuple[float, float], tuple[float, float]] =
+         VIENNA_BOUNDS,
+         zoom_levels: tuple[int, ...] = SEED_ZOOM_LEVELS) -> None:
+    """Fills the cache with all tiles of the bounding box and the
+    external assets, e.g. before running offline"""
+    (south, west), (north, east) = bounds
+    jobs = []
+    for zoom in zoom_levels:
+        min_x, min_y = tile_range(north, west, zoom)
+        max_x, max_y = tile_range(south, east, zoom)
+        jobs += [
+            (f"{zoom}/{x}/{y}.png", TILE_UPSTREAM.format(z=zoom, x=x, y=y))
+            for x in range(min_x, max_x + 1)
+            for y in range(min_y, max_y + 1)]
+    jobs += [(f"assets/{name}", url) for name, url in EXTERNAL_ASSETS.items()]
+    failed = [
+        key for key, url in jobs if fetch(key, url, offline=False) is None]
+    print(f"Cache befüllt: {len(jobs) - len(failed)} Dateien, "
+          f"{len(failed)} fehlgeschlagen")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ['seed']:
+        sys.exit("Usage: python -m files.tile_proxy seed")
+    seed()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from files.data import df, species_list
+
+# Tagesnummern ab dem ersten Sammeltag; 0 steht für Proben ohne Datum, die
+# nur in der Gesamtsaison mitzählen. Fehlende Daten sind durch fillna(0)
+# eine 0, die pd.to_datetime sonst als 1970-01-01 liest.
+dates = pd.to_datetime(
+    df['collectionEnd'].mask(df['collectionEnd'].astype(str) == '0'),
+    errors='coerce')
+first_date = dates.min()
+last_date = dates.max()
+day_numbers = ((dates - first_date).dt.days + 1).fillna(0).astype(int) \
+    .to_numpy()
+n_days = int(day_numbers.max()) + 1
+FULL_SEASON = (0, n_days - 1)
+# Zeitfenster ohne Sammeltage, z.B. wenn der Beginn nach dem Ende liegt
+EMPTY_WINDOW = (1, 0)
+
+# Zeilen nach Datum sortiert, ein Zeitfenster ist ein Ausschnitt daraus
+row_order = np.argsort(day_numbers, kind='stable')
+sorted_days = day_numbers[row_order]
+
+
+def get_window(start_date: str | None, end_date: str | None) \
+        -> tuple[int, int]:
+    """Inclusive day number range for the date picker values, clamped to
+    the collection days"""
+    if not start_date and not end_date:
+        return FULL_SEASON
+    start, end = 1, n_days - 1
+    if start_date:
+        start = (pd.Timestamp(start_date) - first_date).days + 1
+    if end_date:
+        end = (pd.Timestamp(end_date) - first_date).days + 1
+    start, end = max(1, start), min(n_days - 1, end)
+    if start > end:
+        return EMPTY_WINDOW
+    return start, end
+
+
+def rows_in_window(window: tuple[int, int]) -> np.ndarray:
+    """Positions of all rows collected within the window, in CSV order"""
+    start = np.searchsorted(sorted_days, window[0], side='left')
+    end = np.searchsorted(sorted_days, window[1], side='right')
+    return np.sort(row_order[start:end])
+
+
+class RangeTotals:
+    """Species counts cumulated along (group, day), so the totals of any
+    group over any window are the difference of two cumulative rows"""
+
+    def __init__(self, groups: pd.Series) -> None:
+        codes, self.groups = pd.factorize(groups, sort=True)
+        self.codes = {group: code for code, group in enumerate(self.groups)}
+        order = np.lexsort((day_numbers, codes))
+        self.keys = codes[order].astype(np.int64) * n_days \
+            + day_numbers[order]
+        counts = df[species_list].to_numpy(dtype=np.int64)[order]
+        self.cumulative = np.vstack([
+            np.zeros((1, len(species_list)), dtype=np.int64),
+            np.cumsum(counts, axis=0)])
+
+    def _bounds(self, codes: np.ndarray, window: tuple[int, int]) \
+            -> tuple[np.ndarray, np.ndarray]:
+        base = codes.astype(np.int64) * n_days
+        return (np.searchsorted(self.keys, base + window[0], side='left'),
+                np.searchsorted(self.keys, base + window[1], side='right'))
+
+    def totals(self, window: tuple[int, int] = FULL_SEASON) -> pd.DataFrame:
+        """Species totals of every group within the window"""
+        if window[0] > window[1]:
+            counts = np.zeros(
+                (len(self.groups), len(species_list)), dtype=np.int64)
+        else:
+            start, end = self._bounds(np.arange(len(self.groups)), window)
+            counts = self.cumulative[end] - self.cumulative[start]
+        return pd.DataFrame(
+            counts,
+            index=self.groups,
+            columns=species_list)
+
+    def sizes(self, window: tuple[int, int] = FULL_SEASON) -> pd.Series:
+        """Number of rows of every group within the window"""
+        if window[0] > window[1]:
+            return pd.Series(0, index=self.groups)
+        start, end = self._bounds(np.arange(len(self.groups)), window)
+        return pd.Series(end - start, index=self.groups)
+
+    def group_totals(self, group: object,
+                     window: tuple[int, int] = FULL_SEASON) -> np.ndarray:
+        """Species totals of one group within the window"""
+        if group not in self.codes or window[0] > window[1]:
+            return np.zeros(len(species_list), dtype=np.int64)
+        start, end = self._bounds(np.array([self.codes[group]]), window)
+        return self.cumulative[end[0]] - self.cumulative[start[0]]
+
+
+participant_ranges = RangeTotals(df['participants'])
+sample_ranges = RangeTotals(df['sampleId'])
+site_ranges = RangeTotals(
+    df.groupby(['participants', 'latitude', 'longitude']).ngroup())
+season_ranges = RangeTotals(pd.Series(0, index=df.index))
@@ -8,12 +8,17 @@ from files.data import df, max_flies, min_flies, species_list, species_rank
 
 def get_color(value: str) -> str:
     """Returns a hex color from yellow to dark red with high contrast"""
-    if max_flies == min_flies:  # Avoid division by zero
+    return get_scaled_color(value, min_flies, max_flies)
+
+
+def get_scaled_color(value: float, min_value: float, max_value: float) -> str:
+    """Returns a hex color from yellow to dark red for the given range"""
+    if max_value == min_value:  # Avoid division by zero
         return "#FFFF00"  # Default to yellow if all values are the same
 
     # Apply log scaling for better contrast (log1p prevents log(0) issues)
-    log_min = np.log1p(min_flies)
-    log_max = np.log1p(max_flies)
+    log_min = np.log1p(min_value)
+    log_max = np.log1p(max_value)
     log_value = np.log1p(value)
 
     ratio = (log_value - log_min) / (
@@ -27,7 +32,10 @@ def get_color(value: str) -> str:
     return f"#{r:02X}{g:02X}{b:02X}"  # Convert to hex format
 
 
-def make_popup(participant: str, species_totals: pd.DataFrame) -> dl.Popup:
+def make_popup(
+        participant: str,
+        species_totals: pd.DataFrame,
+        metrics: pd.Series | None = None) -> dl.Popup:
     # Extrahiere die Summe für den Teilnehmer
     total_flies = int(species_totals['Total per Sample'].iloc[
                           0])  # Gesamtzahl der Fliegen für den Teilnehmer
@@ -53,6 +61,13 @@ def make_popup(participant: str, species_totals: pd.DataFrame) -> dl.Popup:
         <strong>subobscura:</strong> {species_data['subobscura']}<br>
         <strong>virilis:</strong> {species_data['virilis']}<br>
     """
+    if metrics is not None:
+        popup_content += f"""
+        <strong>Richness:</strong> {int(metrics['Richness'])}<br>
+        <strong>Shannon:</strong> {metrics['Shannon']:.3f}<br>
+        <strong>Simpson:</strong> {metrics['Simpson']:.3f}<br>
+        <strong>Evenness:</strong> {metrics['Evenness']:.3f}<br>
+    """
 
     # Popup mit Markdown für HTML-Inhalt zurückgeben
     return dl.Popup(
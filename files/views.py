@@ -0,0 +1,165 @@
+import uuid
+from functools import lru_cache
+from typing import Any
+
+import dash_leaflet as dl
+import numpy as np
+import pandas as pd
+from dash import html
+from dash_leaflet import CircleMarker
+
+from files.data import df, species_list
+from files.figures import empty_figure, get_figure
+from files.metrics import get_participant_metrics
+from files.similarity import similar_participants
+from files.sites import site_index
+from files.timerange import (
+    FULL_SEASON, participant_ranges, rows_in_window, site_ranges)
+from files.util import get_color, get_species_color, make_popup
+
+PARTICIPANT_ZOOM = 13
+
+
+def make_marker(row: Any) -> CircleMarker:
+    """Marker of a sample that is not part of the selection"""
+    return dl.CircleMarker(
+        id=str(uuid.uuid4()),
+        center=[row.latitude, row.longitude],
+        radius=6,
+        color="#999",  # z.B. grau für nicht-ausgewählte
+        fillColor=get_color(row.total_flies),
+        fillOpacity=0.2,
+        children=dl.Tooltip(
+            f"{row.participants} - {row.total_flies} flies"))
+
+
+def make_selected_marker(row: Any, counts: np.ndarray,
+                         metrics: pd.Series) -> CircleMarker:
+    """Marker of a sample of the selected participant with a popup of the
+    participant's totals"""
+    species_totals = pd.DataFrame([counts], columns=species_list)
+    species_totals.insert(0, 'sampleId', 'Total per Participant')
+    species_totals['Total per Sample'] = species_totals[
+        species_list].sum(axis=1)
+    return dl.CircleMarker(
+        id=str(uuid.uuid4()),
+        center=[row.latitude, row.longitude],
+        radius=10,
+        color='#000000',
+        fillColor="purple",
+        fillOpacity=0.8,
+        children=make_popup(
+            row.participants,
+            species_totals,
+            metrics))
+
+
+def make_similar_list(participant: str) -> list[Any]:
+    """Participants with the most similar species composition"""
+    similar = similar_participants(participant)
+    if not similar:
+        return []
+    return [
+        html.H4("Ähnliche Teilnehmer"),
+        html.Ol([
+            html.Li(
+                f"{entry['participant']} (Bray-Curtis {entry['bray_curtis']}, "
+                f"Jaccard {entry['jaccard']})")
+            for entry in similar])]
+
+
+def get_species_markers(
+        species: str,
+        window: tuple[int, int] = FULL_SEASON) -> tuple[list[Any], list[Any]]:
+    """One marker per trap site where the species was found within the
+    window, and the bounds around them"""
+    # Fangzahlen pro Falle; die Reihenfolge der Fallen entspricht der des
+    # Site-Index
+    counts = site_ranges.totals(window)[species].to_numpy()
+    found = counts > 0
+    sites = site_index.sites.iloc[np.flatnonzero(found)]
+    if sites.empty:
+        return [], []  # Keine Marker, keine Bounds
+    markers = [
+        dl.CircleMarker(
+            id=str(uuid.uuid4()),
+            center=[lat, lon],
+            radius=8,
+            color='black',
+            fillColor=get_species_color(species),
+            fillOpacity=0.6,
+            children=dl.Tooltip(f"{species}: {count}"))
+        for lat, lon, count in zip(
+            sites['latitude'], sites['longitude'], counts[found])]
+    bounds = [
+        [sites['latitude'].min(), sites['longitude'].min()],
+        [sites['latitude'].max(), sites['longitude'].max()]]
+    return markers, bounds
+
+
+def get_overview_position() -> tuple[list[float], int]:
+    """Center and rough zoom level covering all samples"""
+    min_lat, max_lat = df['latitude'].min(), df['latitude'].max()
+    min_lon, max_lon = df['longitude'].min(), df['longitude'].max()
+    map_center = [(min_lat + max_lat) / 2, (min_lon + max_lon) / 2]
+    # Grober Zoom-Level, der die gesamte Streuung halbwegs abdeckt
+    auto_zoom = 8 if max_lat - min_lat < 1.5 and max_lon - min_lon < 1.5 else 6
+    return map_center, auto_zoom
+
+
+@lru_cache(maxsize=512)
+def _participant_view(
+        participant: str | None,
+        window: tuple[int, int]) -> dict[str, Any]:
+    visible = rows_in_window(window)
+    markers = [base_markers[position] for position in visible]
+    if not participant:
+        center, zoom = get_overview_position()
+        return {
+            'markers': markers,
+            'center': center,
+            'zoom': zoom,
+            'sample_options': [],
+            'pie': empty_figure(),
+            'similar': []}
+
+    own_rows = participant_rows.get(participant, np.array([], dtype=int))
+    rows = df.iloc[own_rows]
+    # Zeilen des Teilnehmers, die im Zeitfenster liegen, und ihre Position
+    # unter den sichtbaren Markern
+    positions = np.searchsorted(visible, own_rows)
+    in_window = positions < len(visible)
+    in_window[in_window] = visible[positions[in_window]] == own_rows[in_window]
+    counts = participant_ranges.group_totals(participant, window)
+    metrics = get_participant_metrics(participant, window)
+    for position, row in zip(
+            positions[in_window], rows[in_window].itertuples()):
+        markers[position] = make_selected_marker(row, counts, metrics)
+    if rows.empty:
+        center, zoom = get_overview_position()
+    else:
+        center = [rows['latitude'].mean(), rows['longitude'].mean()]
+        zoom = PARTICIPANT_ZOOM
+    return {
+        'markers': markers,
+        'center': center,
+        'zoom': zoom,
+        'sample_options': [
+            {"label": s, "value": s}
+            for s in rows[in_window]['sampleId'].unique()],
+        'pie': get_figure('participant_pie', participant, window),
+        'similar': make_similar_list(participant)}
+
+
+def get_participant_view(
+        participant: str | None,
+        window: tuple[int, int] = FULL_SEASON) -> dict[str, Any]:
+    """Everything that depends on the selected participant and time window
+    (markers, map position, sample options, pie chart, similar
+    participants), resolved once per selection and shared by all outputs"""
+    return _participant_view(participant or None, window)
+
+
+# Nicht ausgewählte Marker aller Samples, einmal beim Laden gebaut
+base_markers = [make_marker(row) for row in df.itertuples()]
+participant_rows = df.groupby('participants').indices
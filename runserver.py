@@ -1,23 +1,28 @@
-import uuid
 from typing import Any
 
 import dash
-import dash_leaflet as dl
-import pandas as pd
-import plotly.graph_objects as go
 import requests
-from dash import dcc, html
+from dash import callback_context, dcc, html, no_update
 from dash.dependencies import Input, Output, State
-from dash.html import Div, Figure
-from dash_leaflet import CircleMarker
+from dash.html import Div
 
-from files.data import df, species_list
+from files.api import api
+from files.data import df
+from files.figures import empty_figure, get_figure
 from files.layout import layout
-from files.util import get_color, get_species_color, make_popup
+from files.regions import get_region_layer
+from files.search import participant_index
+from files.sites import site_index
+from files.table import PAGE_SIZE, sample_table
+from files.tile_proxy import tile_proxy
+from files.timerange import get_window
+from files.views import get_participant_view, get_species_markers
 
 # Initialize Dash app
 app = dash.Dash(__name__)
 server = app.server
+server.register_blueprint(tile_proxy)
+server.register_blueprint(api)
 
 # Layout
 # Testen Sie die layout() Funktion direkt
@@ -34,83 +39,31 @@ except Exception as e:
 
 
 @app.callback(
-    [Output('markers', 'children'),
-     Output('map', 'center'),
-     Output('map', 'zoom')],
-    [Input('participant-dropdown', 'value')],
-    [State('map', 'zoom')])  # Speichere den aktuellen Zoom-Wert
-def update_map(
-        selected_participant: str,
-        current_zoom: int) -> tuple[list[CircleMarker], list[Any], int | Any]:
-    # Sicherstellen, dass Längen- und Breitengrade numerisch sind
-    df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce').fillna(0)
-    df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce').fillna(0)
-
-    # Marker für alle Teilnehmer
-    selected_marker = None
-    all_markers = []
-    for _, row in df.iterrows():
-        unique_id = str(uuid.uuid4())
-        is_selected = selected_participant == row['participants']
-        marker_radius = 10 if is_selected else 6
-        border_color = '#000000' if is_selected else "#999"  # z.B. grau für
-        # nicht-ausgewählte
-        fill_color = "purple" if is_selected else get_color(row['total_flies'])
-
-        # Berechne die species_totals für den Teilnehmer, falls ausgewählt
-        if is_selected:
-            filtered_df = df[df['participants'] == row['participants']].copy()
-            species_totals = filtered_df[species_list].sum().to_frame().T
-            species_totals['sampleId'] = 'Total per Participant'
-            species_totals['Total per Sample'] = species_totals[
-                species_list].sum(axis=1)
-
-            all_markers.append(
-                dl.CircleMarker(
-                    id=unique_id,
-                    center=[row['latitude'], row['longitude']],
-                    radius=marker_radius,
-                    color=border_color,
-                    fillColor=fill_color,
-                    fillOpacity=0.8 if is_selected else 0.2,
-                    children=make_popup(row['participants'], species_totals)
-                    # Übergabe von species_totals
-                )
-            )
-        else:
-            all_markers.append(
-                dl.CircleMarker(
-                    id=unique_id,
-                    center=[row['latitude'], row['longitude']],
-                    radius=marker_radius,
-                    color=border_color,
-                    fillColor=fill_color,
-                    fillOpacity=0.8 if is_selected else 0.2,
-                    children=dl.Tooltip(
-                        f"{row['participants']} - {row['total_flies']} flies")
-                )
-            )
-
-    if selected_participant:
-        filtered_df = df[df['participants'] == selected_participant].copy()
-        if not filtered_df.empty:
-            participant_lat = filtered_df['latitude'].mean()
-            participant_lon = filtered_df['longitude'].mean()
-            participant_center = [participant_lat, participant_lon]
-            return all_markers, participant_center, 13
-
-    # Kein Participant ausgewählt → auf alle Punkte zoomen
-    min_lat = df['latitude'].min()
-    max_lat = df['latitude'].max()
-    min_lon = df['longitude'].min()
-    max_lon = df['longitude'].max()
-
-    map_center = [(min_lat + max_lat) / 2, (min_lon + max_lon) / 2]
-
-    # Grober Zoom-Level, der die gesamte Streuung halbwegs abdeckt
-    auto_zoom = 8 if max_lat - min_lat < 1.5 and max_lon - min_lon < 1.5 else 6
-
-    return all_markers, map_center, auto_zoom
+    Output('participant-dropdown', 'options'),
+    Input('participant-dropdown', 'search_value'),
+    State('participant-dropdown', 'value'))
+def update_participant_options(
+        search_value: str, selected_participant: str) -> list[Any]:
+    """Top matches for the typed participant ID; the selected participant
+    always stays in the options so its label remains visible"""
+    matches = participant_index.search(search_value or '')
+    if selected_participant and selected_participant not in matches:
+        matches = [selected_participant, *matches]
+    return [{'label': p, 'value': p} for p in matches]
+
+
+@app.callback(
+    Output('regions', 'children'),
+    [Input('region-level', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')])
+def update_region_layer(
+        region_level: str,
+        start_date: str,
+        end_date: str) -> list[Any]:
+    """Serves the choropleth for districts or hex cells within the time
+    window, cached per level and window"""
+    return get_region_layer(region_level, get_window(start_date, end_date))
 
 
 @app.callback(
@@ -170,157 +123,148 @@ def download_table(n_clicks, download_option, selected_participant):
 
 
 @app.callback(
-    Output('sample-dropdown', 'options'),
-    Input('participant-dropdown', 'value'))
-def update_sample_dropdown(selected_participant: str) -> list[Any]:
-    """Updates the sample dropdown based on selected participant"""
-    if selected_participant:
-        sample_ids = df[
-            df["participants"] == selected_participant]["sampleId"].unique()
-        return [{"label": s, "value": s} for s in sample_ids]
-    return []  # Return empty if no participant is selected
-
-
-@app.callback(
-    Output('species-table', 'data'),
-    Input('participant-dropdown', 'value'))
-def update_species_table(selected_participant: str) -> list[Any]:
-    print("Callback für Tabelle aufgerufen!")
-
-    if selected_participant:
-        filtered_df = df[df['participants'] == selected_participant].copy()
-
-        # Gruppiere nach Sample ID und summiere die Arten (für die einzelnen
-        # Sample-Zeilen)
-        species_by_sample = (
-            filtered_df.groupby('sampleId')[species_list].sum().reset_index())
-        species_by_sample['Total per Sample'] = (
-            species_by_sample[species_list].sum(axis=1))
-
-        # Berechne die Summe jeder Species über alle Samples des Participants
-        species_totals = filtered_df[species_list].sum().to_frame().T
-        # Füge eine "Sample ID" für die Summenzeile hinzu
-        species_totals['sampleId'] = 'Total per Participant'
-        # Berechne die Gesamtsumme für den Participant
-        species_totals['Total per Sample'] = (
-            species_totals[species_list].sum(axis=1))
-        print(f"Inhalt von species_totals nach Berechnung der Summe:\n"
-              f"{species_totals}")
-
-        # Kombiniere die Sample-Daten mit der Summenzeile
-        final_data = pd.concat(
-            [species_by_sample, species_totals], ignore_index=True)
-        print(f"Daten für die Tabelle (final_data.to_dict('records')):\n"
-              f"{final_data.to_dict('records')}")
-        return final_data.to_dict('records')
-    return []
+    [Output('markers', 'children'),
+     Output('map', 'center'),
+     Output('map', 'zoom'),
+     Output('sample-dropdown', 'options'),
+     Output('participant-species-pie-chart', 'figure'),
+     Output('similar-participants', 'children'),
+     Output('species-table', 'data'),
+     Output('species-table', 'page_count'),
+     Output('species-table', 'page_current')],
+    [Input('participant-dropdown', 'value'),
+     Input('species-table', 'page_current'),
+     Input('species-table', 'page_size'),
+     Input('species-table', 'sort_by'),
+     Input('species-table', 'filter_query'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')])
+def update_participant_views(
+        selected_participant: str,
+        page_current: int,
+        page_size: int,
+        sort_by: list[dict[str, str]],
+        filter_query: str,
+        start_date: str,
+        end_date: str) -> tuple[Any, ...]:
+    """Renders everything that depends on the participant and time window
+    in one request from the shared participant view; paging, sorting and
+    filtering the table only update the table"""
+    triggered = callback_context.triggered_prop_ids
+    view_changed = not triggered or any(
+        prop in triggered for prop in (
+            'participant-dropdown.value',
+            'date-range.start_date',
+            'date-range.end_date'))
+    # Eine neue Auswahl oder ein neuer Filter beginnt auf der ersten Seite
+    if view_changed or 'species-table.filter_query' in triggered:
+        page_current = 0
+    window = get_window(start_date, end_date)
+    data, page_count = sample_table.query(
+        selected_participant,
+        page_current or 0,
+        page_size or PAGE_SIZE,
+        sort_by,
+        filter_query,
+        window)
+    table_outputs = (data, page_count, page_current or 0)
+    if not view_changed:
+        return (no_update,) * 6 + table_outputs
+
+    view = get_participant_view(selected_participant, window)
+    return (
+        view['markers'],
+        view['center'],
+        view['zoom'],
+        view['sample_options'],
+        view['pie'],
+        view['similar']) + table_outputs
 
 
 @app.callback(
-    Output('participant-species-pie-chart', 'figure'),
-    Input('participant-dropdown', 'value'))
-def update_participant_pie_chart(selected_participant: str) -> Figure:
-    if selected_participant:
-        participant_data = (
-            df[df['participants'] == selected_participant][species_list].sum())
-        # Filtere Arten mit Werten größer als 0
-        filtered_data = participant_data[participant_data > 0]
-        labels = filtered_data.index
-        values = filtered_data.values
-        colors = [get_species_color(species) for species in labels]
-        showlegend = False
-        fig = go.Figure(data=[
-            go.Pie(labels=labels, values=values, marker=dict(colors=colors),
-                   showlegend=False)])
-        fig.update_layout(
-            title=f"Artenverteilung Teilnehmer {selected_participant}")
-        return fig
-    return go.Figure()
+    Output('sample-species-pie-chart', 'figure'),
+    [Input('sample-dropdown', 'value'),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')])
+def update_sample_pie_chart(
+        selected_sample: str,
+        start_date: str,
+        end_date: str) -> dict[str, Any]:
+    if selected_sample:
+        return get_figure(
+            'sample_pie', selected_sample, get_window(start_date, end_date))
+    return empty_figure()
 
 
 @app.callback(
-    Output('sample-species-pie-chart', 'figure'),
-    Input('sample-dropdown', 'value'))
-def update_sample_pie_chart(selected_sample: str) -> Figure:
-    if selected_sample:
-        sample_data = df[df['sampleId'] == selected_sample][species_list].sum()
-        # Filtere Arten mit Werten größer als 0
-        filtered_data = sample_data[sample_data > 0]
-        labels = filtered_data.index
-        values = filtered_data.values
-        colors = [get_species_color(species) for species in labels]
-        fig = go.Figure(data=[
-            go.Pie(labels=labels, values=values, marker=dict(colors=colors),
-                   showlegend=False)])
-        fig.update_layout(title=f"Artenverteilung Falle {selected_sample}")
-        return fig
-    return go.Figure()
+    Output('vienna-pie-chart', 'figure'),
+    [Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')],
+    prevent_initial_call=True)
+def update_vienna_pie_chart(start_date: str, end_date: str) -> dict[str, Any]:
+    return get_figure(
+        'vienna_pie', window=get_window(start_date, end_date))
 
 
 @app.callback(
     Output("species-time-series", "figure"),
-    Input("common-species-dropdown", "value"))
-def update_time_series(selected_species: str) -> Figure:
+    [Input("common-species-dropdown", "value"),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')])
+def update_time_series(
+        selected_species: str,
+        start_date: str,
+        end_date: str) -> dict[str, Any]:
     if selected_species:
-        # Stelle sicher, dass die collectionEnd-Spalte
-        # im DataFrame ein datetime-Objekt ist
-        df_copy = df.copy()
-        df_copy['collectionEnd'] = pd.to_datetime(df_copy['collectionEnd'])
-
-        # Nur Einträge mit Vorkommen der Spezies
-        filtered_df = df[df[selected_species] > 0].copy()
-        if not filtered_df.empty:
-            # Verwende go.Bar für ein Säulendiagramm
-            fig = go.Figure(
-                data=[go.Bar(
-                    x=filtered_df['collectionEnd'],
-                    y=filtered_df[selected_species],
-                    marker_color=get_species_color(selected_species))])
-            fig.update_layout(
-                xaxis_title="Time",
-                yaxis_title=f"Number of {selected_species}")
-            return fig
-        return go.Figure(
-            data=[go.Bar(x=[], y=[])],  # Leere Balken
-            layout=go.Layout(title=f"No data found for {selected_species}")
-        )
-    return go.Figure()  # Leerer Graph, wenn keine Spezies ausgewählt ist
+        return get_figure(
+            'time_series', selected_species, get_window(start_date, end_date))
+    return empty_figure()  # Leerer Graph, wenn keine Spezies ausgewählt ist
 
 
 @app.callback(
     [Output("species-markers", "children"),
      Output("species-collection-map", "bounds")],
-    Input("common-species-dropdown", "value"))
-def update_species_map(selected_species: str) -> tuple[list[Any], list[Any]]:
+    [Input("common-species-dropdown", "value"),
+     Input('date-range', 'start_date'),
+     Input('date-range', 'end_date')])
+def update_species_map(
+        selected_species: str,
+        start_date: str,
+        end_date: str) -> tuple[list[Any], list[Any]]:
     if selected_species:
-        # Nur Einträge mit Vorkommen der Spezies
-        filtered_df = df[df[selected_species] > 0].copy()
-        if not filtered_df.empty:
-            markers = []
-            for _, row in filtered_df.iterrows():
-                unique_id = str(uuid.uuid4())
-                markers.append(dl.CircleMarker(
-                    id=unique_id,
-                    center=[row['latitude'], row['longitude']],
-                    radius=8,
-                    color='black',
-                    fillColor=get_species_color(selected_species),
-                    fillOpacity=0.6,
-                    children=dl.Tooltip(f"{selected_species}")))
-
-            # Berechne die Bounds der Marker
-            lats = filtered_df['latitude'].tolist()
-            longs = filtered_df['longitude'].tolist()
-            if lats and longs:
-                min_lat = min(lats)
-                max_lat = max(lats)
-                min_lon = min(longs)
-                max_lon = max(longs)
-                bounds = [[min_lat, min_lon], [max_lat, max_lon]]
-                return markers, bounds
+        return get_species_markers(
+            selected_species, get_window(start_date, end_date))
     return [], []  # Keine Marker, keine Bounds
 
 
+NEARBY_RADIUS_KM = 2
+
+
+@app.callback(
+    Output('nearby-sites', 'children'),
+    Input('species-collection-map', 'clickData'),
+    State('common-species-dropdown', 'value'),
+    prevent_initial_call=True)
+def update_nearby_sites(click_data: dict[str, Any], species: str) -> Div:
+    """Lists the nearest traps with the selected species around a click"""
+    if not click_data or not species:
+        return html.Div("Bitte zuerst eine Art wählen.")
+    lat = click_data['latlng']['lat']
+    lon = click_data['latlng']['lng']
+    sites = site_index.within_radius(lat, lon, NEARBY_RADIUS_KM, species)
+    title = f"Fallen mit {species} im Umkreis von {NEARBY_RADIUS_KM} km"
+    if not sites:
+        sites = site_index.nearest(lat, lon, 5, species)
+        title = f"Nächste Fallen mit {species}"
+    return html.Div([
+        html.H4(title),
+        html.Ul([
+            html.Li(
+                f"{site['participant']}: {site['count']} {species} "
+                f"({site['distance_km']} km)")
+            for site in sites])])
+
+
 # Run the app
 if __name__ == "__main__":
     app.run(debug=True, use_reloader=False)
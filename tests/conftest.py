@@ -0,0 +1,38 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SPECIES = [
+    'melanogaster', 'simulans', 'suzukii', 'busckii', 'testacea', 'hydei',
+    'mercatorum', 'repleta', 'funebris', 'immigrans', 'phalerata',
+    'subobscura', 'virilis']
+
+
+@pytest.fixture(scope='session')
+def modules(tmp_path_factory: pytest.TempPathFactory) -> dict:
+    """Imports the data modules against a synthetic flies.csv"""
+    rng = np.random.default_rng(7)
+    rows = []
+    for participant in range(6):
+        for sample in range(3):
+            counts = rng.integers(0, 8, len(SPECIES))
+            counts[rng.random(len(SPECIES)) < 0.4] = 0
+            rows.append({
+                'participants': f'P{participant}',
+                'sampleId': f'P{participant}-{sample}',
+                'latitude': 48.2 + participant / 100,
+                'longitude': 16.3 + participant / 100,
+                'bait': 'banana',
+                # Absichtlich nicht nach Datum sortiert
+                'collectionEnd': f'2024-0{9 - sample}-{10 + participant}',
+                **dict(zip(SPECIES, counts)),
+                'total_flies': counts.sum()})
+    path = tmp_path_factory.mktemp('data')
+    pd.DataFrame(rows).to_csv(path / 'flies.csv', index=False)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(path)
+        return {
+            name: importlib.import_module(f'files.{name}')
+            for name in ('data', 'figures', 'table', 'util')}
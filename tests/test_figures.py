@@ -0,0 +1,95 @@
+"""The cached figure dicts must render exactly like the plotly figures the
+callbacks used to build."""
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.utils import PlotlyJSONEncoder
+
+
+def decode(value: object) -> object:
+    """Plotly JSON with typed arrays (bdata) turned back into lists"""
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            array = np.frombuffer(
+                base64.b64decode(value['bdata']), dtype=value['dtype'])
+            return array.reshape(value.get('shape', len(array))).tolist()
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+def assert_same(figure: dict, expected: go.Figure) -> None:
+    assert decode(json.loads(json.dumps(figure, cls=PlotlyJSONEncoder))) \
+        == decode(json.loads(pio.to_json(expected)))
+
+
+def species_pie(counts: pd.Series, title: str, color) -> go.Figure:
+    found = counts[counts > 0]
+    figure = go.Figure(data=[go.Pie(
+        labels=found.index,
+        values=found.values,
+        marker=dict(colors=[color(species) for species in found.index]),
+        showlegend=False)])
+    figure.update_layout(title=title)
+    return figure
+
+
+def test_participant_pie(modules: dict) -> None:
+    df, color = modules['data'].df, modules['util'].get_species_color
+    species_list = modules['data'].species_list
+    for participant in df['participants'].unique():
+        counts = df[df['participants'] == participant][species_list].sum()
+        assert_same(
+            modules['figures'].get_figure('participant_pie', participant),
+            species_pie(
+                counts, f"Artenverteilung Teilnehmer {participant}", color))
+
+
+def test_sample_pie(modules: dict) -> None:
+    df, color = modules['data'].df, modules['util'].get_species_color
+    species_list = modules['data'].species_list
+    for sample in df['sampleId'].unique():
+        counts = df[df['sampleId'] == sample][species_list].sum()
+        assert_same(
+            modules['figures'].get_figure('sample_pie', sample),
+            species_pie(counts, f"Artenverteilung Falle {sample}", color))
+
+
+def test_vienna_pie(modules: dict) -> None:
+    df, color = modules['data'].df, modules['util'].get_species_color
+    species_list = modules['data'].species_list
+    expected = go.Figure(data=[go.Pie(
+        labels=species_list,
+        values=[df[species].sum() for species in species_list],
+        marker=dict(colors=[color(species) for species in species_list]),
+        hoverinfo='label+percent',
+        textinfo='value',
+        showlegend=True)])
+    expected.update_layout(
+        title="Artenverteilung VCF 2024",
+        showlegend=True,
+        legend=dict(x=1.05, y=1, traceorder='normal', orientation='v',
+                    xanchor='left', yanchor='top'),
+        margin=dict(l=0, r=150, b=0, t=50))
+    assert_same(modules['figures'].get_figure('vienna_pie'), expected)
+
+
+def test_time_series(modules: dict) -> None:
+    df, color = modules['data'].df, modules['util'].get_species_color
+    # Die Zeitreihe ist seit dem Zeitfenster nach Datum sortiert
+    by_date = df.sort_values('collectionEnd', kind='stable')
+    for species in modules['data'].species_list:
+        found = by_date[by_date[species] > 0]
+        expected = go.Figure(data=[go.Bar(
+            x=found['collectionEnd'],
+            y=found[species],
+            marker_color=color(species))])
+        expected.update_layout(
+            xaxis_title="Time", yaxis_title=f"Number of {species}")
+        assert_same(
+            modules['figures'].get_figure('time_series', species), expected)
@@ -0,0 +1,57 @@
+"""Server-side filtering and sorting of the species table must match the
+same operations in pandas."""
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope='module')
+def table(modules: dict):
+    return modules['table'].SampleTable(modules['table'].get_sample_rows())
+
+
+def sample_ids(records: list[dict]) -> list[str]:
+    return [row['sampleId'] for row in records if row['sampleId'] != 'Total']
+
+
+def query(table, sort_by=None, filter_query='') -> list[str]:
+    records, _ = table.query(
+        None, 0, len(table.rows) + 1, sort_by or [], filter_query)
+    return sample_ids(records)
+
+
+@pytest.mark.parametrize('sort_by', [
+    [{'column_id': 'suzukii', 'direction': 'desc'}],
+    [{'column_id': 'suzukii', 'direction': 'asc'}],
+    [{'column_id': 'suzukii', 'direction': 'desc'},
+     {'column_id': 'sampleId', 'direction': 'asc'}],
+    [{'column_id': 'Richness', 'direction': 'asc'},
+     {'column_id': 'melanogaster', 'direction': 'desc'},
+     {'column_id': 'sampleId', 'direction': 'desc'}]])
+def test_sort(table, sort_by: list[dict]) -> None:
+    expected = table.rows.sort_values(
+        [s['column_id'] for s in sort_by],
+        ascending=[s['direction'] == 'asc' for s in sort_by],
+        kind='stable')
+    assert query(table, sort_by) == expected['sampleId'].tolist()
+
+
+@pytest.mark.parametrize('filter_query, expected', [
+    ('{sampleId} contains P1', lambda r: r['sampleId'].str.contains('P1')),
+    ('{sampleId} contains "-2"', lambda r: r['sampleId'].str.contains('-2')),
+    ('{sampleId} icontains p2', lambda r: r['sampleId'].str.contains('P2')),
+    ('{sampleId} = P3-1', lambda r: r['sampleId'] == 'P3-1'),
+    ('{melanogaster} = 3', lambda r: r['melanogaster'] == 3),
+    ('{melanogaster} contains 3',
+     lambda r: r['melanogaster'].astype(str).str.contains('3')),
+    ('{suzukii} > 4', lambda r: r['suzukii'] > 4),
+    ('{suzukii} <= 4', lambda r: r['suzukii'] <= 4),
+    ('{suzukii} != 0', lambda r: r['suzukii'] != 0),
+    ('{Shannon} ge 1.5', lambda r: r['Shannon'] >= 1.5),
+    ('{Total per Sample} lt 30 && {sampleId} contains P4',
+     lambda r: (r['Total per Sample'] < 30)
+     & r['sampleId'].str.contains('P4')),
+    ('{suzukii} > abc', lambda r: pd.Series(False, index=r.index))])
+def test_filter(table, filter_query: str, expected) -> None:
+    rows = table.rows
+    assert query(table, filter_query=filter_query) \
+        == rows.loc[expected(rows), 'sampleId'].tolist()
@@ -0,0 +1,130 @@
+"""Tile proxy against a local stand-in tile server: revalidation, offline
+mode and eviction under the size limit."""
+import os
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from files import tile_proxy
+
+TILE_BYTES = 1000
+
+
+class StandInTileServer(BaseHTTPRequestHandler):
+    """Serves a fixed tile per path with an ETag, answers 304 when the
+    client already has it and logs every request"""
+    requests: list[tuple[str, str | None, int]] = []
+    max_age = 0
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        etag = f'"{self.path}"'
+        status = 304 if self.headers.get('If-None-Match') == etag else 200
+        self.requests.append(
+            (self.path, self.headers.get('If-None-Match'), status))
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'max-age={self.max_age}')
+        if status == 200:
+            body = self.path.encode().ljust(TILE_BYTES, b'.')
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.end_headers()
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def upstream() -> Iterator[str]:
+    StandInTileServer.requests = []
+    StandInTileServer.max_age = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInTileServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/{{z}}/{{x}}/{{y}}.png"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch: pytest.MonkeyPatch) -> tile_proxy.DiskCache:
+    disk_cache = tile_proxy.DiskCache(str(tmp_path), 2500)
+    monkeypatch.setattr(tile_proxy, 'cache', disk_cache)
+    return disk_cache
+
+
+def fetch_tile(upstream: str, x: int, offline: bool = False):
+    key = f"13/{x}/0.png"
+    return tile_proxy.fetch(
+        key, upstream.format(z=13, x=x, y=0), offline=offline)
+
+
+def test_revalidation(upstream: str, cache: tile_proxy.DiskCache) -> None:
+    content, meta = fetch_tile(upstream, 1)
+    # max-age=0, also ist der Eintrag sofort veraltet und wird per ETag
+    # revalidiert statt neu geladen
+    revalidated, revalidated_meta = fetch_tile(upstream, 1)
+    assert revalidated == content
+    assert revalidated_meta['etag'] == meta['etag']
+    assert [status for *_, status in StandInTileServer.requests] \
+        == [200, 304]
+    assert StandInTileServer.requests[1][1] == '"/13/1/0.png"'
+
+
+def test_fresh_entries_skip_upstream(
+        upstream: str, cache: tile_proxy.DiskCache) -> None:
+    StandInTileServer.max_age = 3600
+    assert fetch_tile(upstream, 1) == fetch_tile(upstream, 1)
+    assert len(StandInTileServer.requests) == 1
+
+
+def test_offline_hit_and_miss(
+        upstream: str, cache: tile_proxy.DiskCache) -> None:
+    content, _ = fetch_tile(upstream, 1)
+    hit = fetch_tile(upstream, 1, offline=True)
+    assert hit is not None and hit[0] == content
+    assert fetch_tile(upstream, 2, offline=True) is None
+    assert len(StandInTileServer.requests) == 1
+
+
+def test_eviction_under_size_limit(
+        upstream: str, cache: tile_proxy.DiskCache) -> None:
+    for x in range(2):
+        fetch_tile(upstream, x)
+        # Eindeutige LRU-Reihenfolge unabhängig von der mtime-Auflösung
+        os.utime(os.path.join(cache.directory, '13', str(x), '0.png'),
+                 (1000 + x, 1000 + x))
+    fetch_tile(upstream, 2)
+
+    assert cache.size <= cache.max_bytes
+    assert not os.path.exists(
+        os.path.join(cache.directory, '13', '0', '0.png'))
+    assert cache.get("13/0/0.png") is None
+    assert cache.get("13/1/0.png") is not None
+    assert cache.get("13/2/0.png") is not None
+
+
+def test_parallel_meta_updates(
+        upstream: str, cache: tile_proxy.DiskCache) -> None:
+    _, meta = fetch_tile(upstream, 1)
+    errors = []
+
+    def update() -> None:
+        try:
+            for _ in range(50):
+                cache.put_meta("13/1/0.png", meta)
+        except OSError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=update) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.get("13/1/0.png")[1] == meta